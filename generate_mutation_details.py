@@ -7,6 +7,7 @@ import os
 import re
 import json
 import sqlite3
+import results_db
 from tqdm import tqdm
 
 def get_mutation_code_from_diff(original_code: str, diff: str) -> str:
@@ -84,8 +85,16 @@ def get_mutation_code_from_diff(original_code: str, diff: str) -> str:
     return '\n'.join(result_lines)
 
 
-def main(base_dir):
+def main(base_dir, results_db_dir=None):
     results = []
+
+    # Read all tasks from the consolidated results database instead of each task's 'cosmic-ray.sqlite'
+    db_mutations = None
+    if results_db_dir is not None:
+        # base_dir: data/{benchmark_name}/mutation_{num_test_cases}/{model_name}
+        benchmark_name, mutation_dir, model_name = os.path.normpath(base_dir).split(os.sep)[-3:]
+        db_mutations = results_db.model_mutations(results_db_dir, benchmark_name, model_name, int(mutation_dir.split("_")[1]))
+
     for task_dir in tqdm(os.listdir(base_dir)):
         if not task_dir.startswith("task_"):
             continue
@@ -94,42 +103,47 @@ def main(base_dir):
         db_path = os.path.join(base_dir, task_dir, "cosmic-ray.sqlite")
         code_path = os.path.join(base_dir, task_dir, "mod.py")
 
-        if not os.path.exists(db_path) or not os.path.exists(code_path):
-            continue
+        if db_mutations is not None:
+            if task_dir not in db_mutations or not os.path.exists(code_path):
+                continue
+            mutations, work_results = db_mutations[task_dir]
+        else:
+            if not os.path.exists(db_path) or not os.path.exists(code_path):
+                continue
+
+            with sqlite3.connect(db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT job_id, operator_name, start_pos_row, start_pos_col, end_pos_row, end_pos_col FROM mutation_specs ORDER BY rowid")
+                mutations = cursor.fetchall()
 
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT job_id, operator_name, start_pos_row, start_pos_col, end_pos_row, end_pos_col FROM mutation_specs")
-            mutations = cursor.fetchall()
-
-            cursor.execute("SELECT job_id, test_outcome, diff FROM work_results")
-            work_results = {row[0]: {"test_outcome": row[1], "diff": row[2]} for row in cursor.fetchall()}
-
-            with open(code_path, "r") as f:
-                original_code = f.read()
-
-            mutants_list = []
-            for job_id, operator_name, start_row, start_col, end_row, end_col in mutations:
-                status = work_results.get(job_id, {}).get("test_outcome", "pending")
-                diff = work_results.get(job_id, {}).get("diff", "No diff")
-
-                mutants_list.append({
-                    "status": status,
-                    "mutation_operator": operator_name,
-                    "mutation_diff": diff,
-                    "mutation_code": get_mutation_code_from_diff(original_code, diff),
-                    "start_line": start_row,
-                    "start_column": start_col,
-                    "end_line": end_row,
-                    "end_column": end_col,
-                })
-
-            results.append({
-                "task_id": task_id,
-                "original_code": original_code,
-                "mutants": mutants_list
+                cursor.execute("SELECT job_id, test_outcome, diff FROM work_results")
+                work_results = {row[0]: {"test_outcome": row[1], "diff": row[2]} for row in cursor.fetchall()}
+
+        with open(code_path, "r") as f:
+            original_code = f.read()
+
+        mutants_list = []
+        for job_id, operator_name, start_row, start_col, end_row, end_col in mutations:
+            status = work_results.get(job_id, {}).get("test_outcome", "pending")
+            diff = work_results.get(job_id, {}).get("diff", "No diff")
+
+            mutants_list.append({
+                "status": status,
+                "mutation_operator": operator_name,
+                "mutation_diff": diff,
+                "mutation_code": get_mutation_code_from_diff(original_code, diff),
+                "start_line": start_row,
+                "start_column": start_col,
+                "end_line": end_row,
+                "end_column": end_col,
             })
 
+        results.append({
+            "task_id": task_id,
+            "original_code": original_code,
+            "mutants": mutants_list
+        })
+
     with open("new_mutation_details.jsonl", "w") as f:
         for result in results:
             f.write(json.dumps(result) + "\n")
@@ -4,17 +4,29 @@
 # Date: 2025-05-27
 
 import re
+import io
 import os
+import sys
 import json
+import signal
 import string
 import random
 import shutil
+import pytest
+import sqlite3
+import tomllib
+import coverage
 import tempfile
 import datetime
 import argparse
+import contextlib
 import subprocess
+import results_db
+import multiprocessing
+import metrics_exporter
 from tqdm import tqdm
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm.contrib.concurrent import process_map
 
 toml_template = """
@@ -26,8 +38,27 @@ test-command = "pytest test.py"
 
 [cosmic-ray.distributor]
 name = "local"
+
+[cosmic-ray.filters.operators-filter]
+exclude-operators = {exclude_operators}
 """
 
+# Operator profiles: regexes (matched against `mutation_specs.operator_name`) of the operators each profile drops.
+# The high-volume operators (number replacement, binary operator swaps) dominate the mutant count.
+operator_profiles = {
+    "full": [],
+    "selective": [
+        r"core/NumberReplacer",
+        r"core/ReplaceBinaryOperator_\w+_(BitAnd|BitOr|BitXor|LShift|RShift|MatMult|Pow|FloorDiv|Mod)$",
+    ],
+    "minimal": [
+        r"core/NumberReplacer",
+        r"core/ReplaceBinaryOperator_",
+        r"core/ReplaceUnaryOperator_",
+        r"core/ReplaceComparisonOperator_\w+_(Is|IsNot|In|NotIn)$",
+    ],
+}
+
 code_import = """
 import os
 import re
@@ -111,10 +142,121 @@ def parse_pytest_output(output: str) -> dict:
         "total_tests": total_tests,
     }
 
-# Initialization 
-def cosmic_ray_init(benchmark_name, model_generation_file, num_test_cases=5, timeout=1, num_samples=100):
-    model_name = model_generation_file.split('/')[-1].split('.')[0]
+def map_batch(fn, args_batch):
+    return [fn(*args) for args in args_batch]
+
+def kill_workers(executor):
+    # ProcessPoolExecutor has no public way to stop a running task
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+
+def wait_or_kill(executor, futures, deadline, on_done):
+    """
+    Waits for `futures` ({future: key}) and calls `on_done(key, result)` for each one that succeeds.
+
+    When no future finishes for `deadline` seconds (None: no deadline), a task is stuck where the SIGALRM
+    timeouts cannot interrupt it (e.g. inside a C call): the pool's workers are killed.
+
+    Returns:
+        A tuple (failed keys, whether the deadline was hit).
+    """
+    failed = list()
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=deadline, return_when=FIRST_COMPLETED)
+        if not done:
+            kill_workers(executor)
+            return failed + [futures[future] for future in pending], True
+        for future in done:
+            try:
+                on_done(futures[future], future.result())
+            except Exception as e:
+                failed.append(futures[future])
+    return failed, False
+
+def process_map_isolated(fn, args_list, crash_result, batch_size=1, max_workers=None, desc=None, task_timeout=None, timeout_result=None, slack=10):
+    """
+    Like `process_map(fn, ...)` over the argument tuples of `args_list`, in batches of `batch_size` tasks per worker.
+
+    A task that kills its worker (segfault, `os._exit`, OOM kill) breaks the whole pool. The batches that did not
+    finish are split in halves and re-run in a fresh pool; a single task that still fails is re-run in a pool of
+    its own, and `crash_result(*args)` is recorded for it if it fails there as well.
+
+    With `task_timeout`, the workers are killed when no batch finishes within `len(batch) * task_timeout + slack`
+    seconds, and the unfinished batches are handled the same way; a single task that still runs out of
+    `task_timeout + slack` seconds gets `timeout_result(*args)` (`crash_result` if None).
+    """
+    results = [None] * len(args_list)
+    pending = [list(range(start, min(start + batch_size, len(args_list)))) for start in range(0, len(args_list), batch_size)]
+    timeout_result = timeout_result or crash_result
+
+    def on_done(batch, batch_results):
+        for i, result in zip(batch, batch_results):
+            results[i] = result
+        progress.update(len(batch))
+
+    with tqdm(total=len(args_list), desc=desc) as progress:
+        while pending:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(map_batch, fn, [args_list[i] for i in batch]): batch for batch in pending}
+                failed, _ = wait_or_kill(executor, futures, max(map(len, pending)) * task_timeout + slack if task_timeout else None, on_done)
+
+            pending = list()
+            for batch in failed:
+                if len(batch) > 1:
+                    pending += [batch[:len(batch) // 2], batch[len(batch) // 2:]]
+                    continue
+                args = args_list[batch[0]]
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    failed, timed_out = wait_or_kill(executor, {executor.submit(map_batch, fn, [args]): batch}, task_timeout + slack if task_timeout else None, on_done)
+                if timed_out:
+                    print(f'[-] Worker timed out on {args}')
+                    results[batch[0]] = timeout_result(*args)
+                    progress.update(1)
+                elif failed:
+                    print(f'[-] Worker crashed on {args}')
+                    results[batch[0]] = crash_result(*args)
+                    progress.update(1)
+
+    return results
+
+def format_exclude_operators(operator_profile):
+    # TOML literal strings keep the regex backslashes as they are
+    return '[' + ', '.join(f"'{pattern}'" for pattern in operator_profiles[operator_profile]) + ']'
+
+def load_exclude_operators(working_dir):
+    with open(f'{working_dir}/cosmic-ray.toml', 'rb') as f:
+        config = tomllib.load(f)
+    return config['cosmic-ray'].get('filters', {}).get('operators-filter', {}).get('exclude-operators', [])
+
+def match_operators(patterns):
+    if not patterns: return None
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+def prune_excluded_operators(working_dir):
+    """
+    Deletes the mutants of the operators excluded by the task's TOML from 'cosmic-ray.sqlite'.
+
+    `cr-filter-operators` would mark them as skipped instead, but skipped jobs still count as
+    completed jobs in `cr-report`, which would dilute the surviving mutants rate.
 
+    Returns:
+        The number of pruned mutants.
+    """
+    exclude_matcher = match_operators(load_exclude_operators(working_dir))
+    if exclude_matcher is None: return 0
+
+    with sqlite3.connect(f'{working_dir}/cosmic-ray.sqlite') as conn:
+        mutations = conn.execute("SELECT job_id, operator_name FROM mutation_specs").fetchall()
+        pruned_jobs = [(job_id,) for job_id, operator_name in mutations if exclude_matcher.match(operator_name)]
+        conn.executemany("DELETE FROM work_results WHERE job_id = ?", pruned_jobs)
+        conn.executemany("DELETE FROM mutation_specs WHERE job_id = ?", pruned_jobs)
+        # cosmic-ray >= 8.5 schedules jobs from 'work_items'
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'work_items'").fetchone():
+            conn.executemany("DELETE FROM work_items WHERE job_id = ?", pruned_jobs)
+    return len(pruned_jobs)
+
+def prepare_mutation_dir(benchmark_name, model_name, num_test_cases):
     if os.path.exists(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}'):
         print(f"[+] 🧹 Cleaning up existing files in {model_name}...")
         try:
@@ -125,6 +267,7 @@ def cosmic_ray_init(benchmark_name, model_generation_file, num_test_cases=5, tim
     print(f"[+] 📂 Creating new directory {model_name}...")
     os.makedirs(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}')
 
+def load_model_generation(model_generation_file, num_samples):
     with open(model_generation_file, 'r') as data_handler:
         # For [json] file
         raw_data = json.loads(data_handler.read())[:num_samples]
@@ -132,40 +275,58 @@ def cosmic_ray_init(benchmark_name, model_generation_file, num_test_cases=5, tim
         # For [jsonl] file
         # raw_data = [json.loads(line) for line in data_handler.readlines()[:num_samples]]
     print(f"[+] ✅ Raw data: {len(raw_data)}")
+    return raw_data
+
+def cosmic_ray_task_init(benchmark_name, model_name, idx, instance, num_test_cases, timeout, operator_profile):
+    os.makedirs(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}')
+
+    # create 'mod.py'
+    with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/mod.py', 'w') as f:
+        mod_code = ''
+        mod_code += code_import + '\n\n'
+        mod_code += instance['code'] + '\n\n'
+        mod_code = rename_test_functions(mod_code)
+        f.write(mod_code)
+
+    # create 'test.py'
+    with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/test.py', 'w') as f:
+        test_code = code_import + '\n\n' + 'from mod import *' + '\n\n'
+        for test in instance['tests'][:num_test_cases]:
+            test_code += f'{test}\n\n'
+        # test_code += "\n\n" + "#" * 100 + "\n\n"
+        f.write(test_code)         
+
+    # create 'toml'
+    with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/cosmic-ray.toml', 'w') as f:
+        f.write(toml_template.format(model_name=model_name, task_id=idx, timeout=timeout, exclude_operators=format_exclude_operators(operator_profile)))
+
+# Initialization 
+def cosmic_ray_init(benchmark_name, model_generation_file, num_test_cases=5, timeout=1, num_samples=100, operator_profile='full'):
+    model_name = model_generation_file.split('/')[-1].split('.')[0]
+
+    prepare_mutation_dir(benchmark_name, model_name, num_test_cases)
+    raw_data = load_model_generation(model_generation_file, num_samples)
+    print(f"[+] 🧬 Operator profile: {operator_profile}")
 
     for idx, instance in tqdm(enumerate(raw_data), desc="[+] 💾 Processing raw data"):
-        os.makedirs(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}')
-
-        # create 'mod.py'
-        with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/mod.py', 'w') as f:
-            mod_code = ''
-            mod_code += code_import + '\n\n'
-            mod_code += instance['code'] + '\n\n'
-            mod_code = rename_test_functions(mod_code)
-            f.write(mod_code)
-
-        # create 'test.py'
-        with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/test.py', 'w') as f:
-            test_code = code_import + '\n\n' + 'from mod import *' + '\n\n'
-            for test in instance['tests'][:num_test_cases]:
-                test_code += f'{test}\n\n'
-            # test_code += "\n\n" + "#" * 100 + "\n\n"
-            f.write(test_code)         
-
-        # create 'toml'
-        with open(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/task_{idx}/cosmic-ray.toml', 'w') as f:
-            f.write(toml_template.format(model_name=model_name, task_id=idx, timeout=timeout))
+        cosmic_ray_task_init(benchmark_name, model_name, idx, instance, num_test_cases, timeout, operator_profile)
 
-def cosmic_ray_setup_wrapper(benchmark_name, model_name, task_id, num_test_cases=5):
-    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
-    
+def cosmic_ray_init_db(working_dir):
     # Initialize Cosmic-Ray Config
     try:
         subprocess.run(['cosmic-ray', 'init', 'cosmic-ray.toml', 'cosmic-ray.sqlite'], cwd=working_dir, check=True)
+        prune_excluded_operators(working_dir)
+        return True
     except Exception as e:
         print(f'[-] Initialize Cosmic-Ray Error: {e}')
         return False
 
+def cosmic_ray_setup_wrapper(benchmark_name, model_name, task_id, num_test_cases=5):
+    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+    
+    if not cosmic_ray_init_db(working_dir):
+        return False
+
     # Run Cosmic-Ray Baseline
     try:
         subprocess.run(['cosmic-ray', 'baseline', 'cosmic-ray.toml'], cwd=working_dir, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60*num_test_cases)
@@ -173,6 +334,106 @@ def cosmic_ray_setup_wrapper(benchmark_name, model_name, task_id, num_test_cases
     except Exception as e:
         return False
 
+def cosmic_ray_baseline_in_process(working_dir, num_test_cases):
+    # Same check as `cosmic-ray baseline`: the unmutated module must pass `pytest test.py`
+    try:
+        run = run_pytest_in_process(working_dir, 'test.py', timeout=60*num_test_cases, cwd=working_dir)
+        return run['exit_code'] == 0 and not run['timed_out']
+    except Exception as e:
+        return False
+
+def cosmic_ray_two_phase_setup_wrapper(benchmark_name, model_name, task_id, test_case_counts=(5, 2, 1)):
+    task_results = dict()
+    baseline_passed = False
+    initialized_dir = None
+
+    for num_test_cases in sorted(test_case_counts, reverse=True):
+        working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task_id}'
+
+        # Phase 1: fast in-process baseline. Tests are prefixes of the same list,
+        # so a task passing a larger test set passes this one as well.
+        if not baseline_passed:
+            baseline_passed = cosmic_ray_baseline_in_process(working_dir, num_test_cases)
+        if not baseline_passed:
+            task_results[num_test_cases] = False
+            continue
+
+        # Phase 2: enumerate mutants only for the tasks passing the baseline. 'mod.py' and the
+        # operator set are the same in every tree, so `cosmic-ray init` runs once and the smaller
+        # test sets get a copy of its database.
+        if initialized_dir is None:
+            task_results[num_test_cases] = cosmic_ray_init_db(working_dir)
+            if task_results[num_test_cases]: initialized_dir = working_dir
+            continue
+        try:
+            shutil.copyfile(f'{initialized_dir}/cosmic-ray.sqlite', f'{working_dir}/cosmic-ray.sqlite')
+            task_results[num_test_cases] = True
+        except Exception as e:
+            print(f'[-] Copy Cosmic-Ray Database Error: {e}')
+            task_results[num_test_cases] = False
+
+    return task_results
+
+def cosmic_ray_two_phase_setup(benchmark_name, model_generation_file, test_case_counts=(5, 2, 1), timeout=1, num_samples=100, operator_profile='full', max_workers=None):
+    """
+    Materializes the task workspaces of every test count and sets them up in one pass.
+
+    Each task is submitted to the worker pool as soon as its workspaces are written, so the
+    setup runs concurrently with the materialization of the remaining tasks. The setup runs
+    the baseline in-process first and only runs `cosmic-ray init` for the tasks that pass it.
+    Replaces `cosmic_ray_init` + `cosmic_ray_setup` for all of `test_case_counts`.
+    """
+    model_name = model_generation_file.split('/')[-1].split('.')[0]
+
+    for num_test_cases in test_case_counts:
+        prepare_mutation_dir(benchmark_name, model_name, num_test_cases)
+    raw_data = load_model_generation(model_generation_file, num_samples)
+    print(f"[+] 🧬 Operator profile: {operator_profile}")
+
+    # The baselines of a task run 60 seconds per test case at most, plus `cosmic-ray init`
+    task_timeout = 60 * sum(test_case_counts) + 60
+
+    total_tasks = list()
+    futures = dict()
+    failed_tasks = list()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for idx, instance in tqdm(enumerate(raw_data), desc="[+] 💾 Processing raw data"):
+            for num_test_cases in test_case_counts:
+                cosmic_ray_task_init(benchmark_name, model_name, idx, instance, num_test_cases, timeout, operator_profile)
+            total_tasks.append(f'task_{idx}')
+            try:
+                futures[executor.submit(cosmic_ray_two_phase_setup_wrapper, benchmark_name, model_name, f'task_{idx}', test_case_counts)] = f'task_{idx}'
+            except Exception as e:
+                failed_tasks.append(f'task_{idx}')
+
+        # The baseline runs model-generated code inside the workers: a task that crashes its worker
+        # breaks the pool and fails the tasks still pending with it, and a task stuck where the
+        # in-process timeout cannot interrupt it (e.g. inside a C call) gets the workers killed
+        task_results = dict()
+        with tqdm(total=len(futures), desc="[+] 🔄 Initialize Cosmic-Ray Mutation") as progress:
+            def on_done(task_id, result):
+                task_results[task_id] = result
+                progress.update(1)
+            failed, _ = wait_or_kill(executor, futures, task_timeout + 10, on_done)
+            failed_tasks += failed
+
+    if failed_tasks:
+        print(f'[-] Setup worker pool broken, re-running {len(failed_tasks)} tasks')
+        crash_result = lambda benchmark_name, model_name, task_id, test_case_counts: {num_test_cases: False for num_test_cases in test_case_counts}
+        retried_results = process_map_isolated(cosmic_ray_two_phase_setup_wrapper, [(benchmark_name, model_name, task_id, test_case_counts) for task_id in failed_tasks], crash_result, batch_size=8, max_workers=max_workers, desc="[+] 🔄 Re-initialize Cosmic-Ray Mutation", task_timeout=task_timeout)
+        task_results.update(zip(failed_tasks, retried_results))
+    task_results = [task_results[task_id] for task_id in total_tasks]
+
+    # Save correct tasks
+    for num_test_cases in test_case_counts:
+        correct_tasks = list()
+        with open(f'data/{benchmark_name}/correct_tasks_tc_{num_test_cases}_{model_name}', 'w') as f:
+            for task_id, result in zip(total_tasks, task_results):
+                if result[num_test_cases]:
+                    correct_tasks.append(task_id)
+                    f.write(f'{task_id}\n')
+        print(f'[+] ✅ Correct Tasks ({num_test_cases} test cases): {len(total_tasks)} -> {len(correct_tasks)} (Convert Rate: {len(correct_tasks) / len(total_tasks):.2%})')
+
 def cosmic_ray_setup(benchmark_name, model_generation_file, num_test_cases=5):
     model_name = model_generation_file.split('/')[-1].split('.')[0]
     total_tasks = list()
@@ -197,7 +458,10 @@ def cosmic_ray_setup(benchmark_name, model_generation_file, num_test_cases=5):
 
     print(f'[+] ✅ Correct Tasks: {len(total_tasks)} -> {len(correct_tasks)} (Convert Rate: {len(correct_tasks) / len(total_tasks):.2%})')
 
-def cosmic_ray_status(benchmark_name, model_name, task, num_test_cases):
+def cosmic_ray_status(benchmark_name, model_name, task, num_test_cases, results_db_dir=None):
+    if results_db_dir is not None:
+        return results_db.task_status(results_db_dir, benchmark_name, model_name, num_test_cases, task)
+
     try:
         cosmic_ray_path = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}/cosmic-ray.sqlite'
         response = subprocess.run(['cr-report', cosmic_ray_path, '--show-pending'], check=True, capture_output=True, text=True)
@@ -217,7 +481,7 @@ def cosmic_ray_status(benchmark_name, model_name, task, num_test_cases):
     else:
         return (False, 0, 0)
     
-def mutation_status(benchmark_name, model_generation_file, num_test_cases):
+def mutation_status(benchmark_name, model_generation_file, num_test_cases, results_db_dir=None):
     model_name = model_generation_file.split('/')[-1].split('.')[0]
     correct_tasks = list()
     correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{num_test_cases}_{model_name}'
@@ -228,28 +492,50 @@ def mutation_status(benchmark_name, model_generation_file, num_test_cases):
     print(f'[+] ✅ Correct Tasks: {len(correct_tasks)}')
     
     for task in correct_tasks:
-        completed, total_jobs_number, completed_jobs_number = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases)
+        completed, total_jobs_number, completed_jobs_number = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases, results_db_dir)
         if completed: 
             print(f'[+] Task {task}: Completed ({completed_jobs_number}/{total_jobs_number})')
         else: 
             print(f'[-] Task {task}: Incompleted ({completed_jobs_number}/{total_jobs_number})')
 
-def mutation_run_wrapper(benchmark_name, model_name, num_test_cases, task):
+def mutation_run_wrapper(benchmark_name, model_name, num_test_cases, task, results_db_dir=None, metrics_queue=None):
     # cosmic-ray exec tutorial.toml tutorial.sqlite
-    completed, _, _ = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases)
-    if completed: return
+    completed, _, _ = cosmic_ray_status(benchmark_name, model_name, task, num_test_cases, results_db_dir)
+    if completed:
+        if metrics_queue is not None: metrics_queue.put(('task_skipped', (model_name, num_test_cases), task, None))
+        return
 
     # print(f"[+] Task {task}: Running mutations")
     working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
     try:
-        subprocess.run(['cosmic-ray', 'exec', f'cosmic-ray.toml', f'cosmic-ray.sqlite'], cwd=working_dir, check=True, timeout=360*num_test_cases)
+        if metrics_queue is not None:
+            tracker = metrics_exporter.TaskProgressTracker(metrics_queue, f'{working_dir}/cosmic-ray.sqlite', model_name, num_test_cases, task)
+            metrics_exporter.run_with_progress(['cosmic-ray', 'exec', f'cosmic-ray.toml', f'cosmic-ray.sqlite'], working_dir, 360*num_test_cases, tracker)
+        else:
+            subprocess.run(['cosmic-ray', 'exec', f'cosmic-ray.toml', f'cosmic-ray.sqlite'], cwd=working_dir, check=True, timeout=360*num_test_cases)
     except subprocess.TimeoutExpired as e:
         # print(f'[-] mutation_run_wrapper, Timeout: {e}')
         pass
     except Exception as e:
         print(f'[-] mutation_run_wrapper, Error: {e}')
 
-def mutation_run(benchmark_name, model_generation_file, num_test_cases):
+    # Mirror the task database into the consolidated results database
+    if results_db_dir is not None:
+        try:
+            results_db.import_task_db(results_db_dir, benchmark_name, model_name, num_test_cases, task)
+        except Exception as e:
+            print(f'[-] mutation_run_wrapper, Results DB Error: {e}')
+
+def mutation_run(benchmark_name, model_generation_file, num_test_cases, results_db_dir=None, metrics_port=None, metrics_file=None, max_workers=None):
+    """
+    Runs `cosmic-ray exec` on every correct task.
+
+    Args:
+        results_db_dir: Mirror the results into the consolidated results database (see `results_db`).
+        metrics_port / metrics_file: Export live throughput metrics in Prometheus text format
+                                     on http://127.0.0.1:{metrics_port}/metrics and / or to metrics_file.
+        max_workers: The worker pool size (process_map's default if None).
+    """
     model_name = model_generation_file.split('/')[-1].split('.')[0]
     correct_tasks = list()
     correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_5_{model_name}'
@@ -259,9 +545,24 @@ def mutation_run(benchmark_name, model_generation_file, num_test_cases):
             correct_tasks.append(line.strip())
     print(f'[+] ✅ Correct Tasks: {len(correct_tasks)}')
 
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    manager = None
+    metrics_queue = None
+    if metrics_port is not None or metrics_file is not None:
+        manager = multiprocessing.Manager()
+        metrics_queue = manager.Queue()
+        exporter = metrics_exporter.MetricsExporter(metrics_queue, max_workers, port=metrics_port, file_path=metrics_file)
+        exporter.register_tasks(model_name, num_test_cases, len(correct_tasks))
+        exporter.start()
+
     print("================================================")
     print(f'[+] ⏱️ Start time: {datetime.datetime.now()}')
-    process_map(mutation_run_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc="[+] 🔮 Running mutations...")
+    try:
+        process_map(mutation_run_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, [results_db_dir]*len(correct_tasks), [metrics_queue]*len(correct_tasks), desc="[+] 🔮 Running mutations...", max_workers=max_workers)
+    finally:
+        if manager is not None:
+            exporter.stop()
+            manager.shutdown()
     print(f'[+] ⏱️ End time: {datetime.datetime.now()}')
 
 def mutation_statistic_wrapper(benchmark_name, model_name, num_test_cases, task):
@@ -303,7 +604,7 @@ def mutation_statistic_wrapper(benchmark_name, model_name, num_test_cases, task)
 
     return statistic_info
 
-def mutation_statistic(benchmark_name, model_generation_file, num_test_cases, baseline_test_cases=5):
+def mutation_statistic(benchmark_name, model_generation_file, num_test_cases, baseline_test_cases=5, results_db_dir=None):
     model_name = model_generation_file.split('/')[-1].split('.')[0]
     correct_tasks = list()
     correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{baseline_test_cases}_{model_name}'
@@ -315,7 +616,11 @@ def mutation_statistic(benchmark_name, model_generation_file, num_test_cases, ba
     
     surviving_mutants_rate = 0.0
 
-    statistics = process_map(mutation_statistic_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...", chunksize=1)
+    if results_db_dir is not None:
+        model_statistics = results_db.model_statistics(results_db_dir, benchmark_name, model_name, num_test_cases)
+        statistics = [model_statistics.get(task, {"task": task, "complete_rate": 0.0, "surviving_mutants_rate": 0.0, "total_jobs_number": 0, "completed_jobs_number": 0, "surviving_mutants_number": 0}) for task in correct_tasks]
+    else:
+        statistics = process_map(mutation_statistic_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc=f"[+] 🔄 Running mutation ({num_test_cases} test cases) statistics...", chunksize=1)
     for statistic in statistics:
         print(f"[+] {statistic}")
         surviving_mutants_rate += statistic["surviving_mutants_rate"]
@@ -325,6 +630,230 @@ def mutation_statistic(benchmark_name, model_generation_file, num_test_cases, ba
 
     return surviving_mutants_rate
 
+def operator_profile_statistic_wrapper(benchmark_name, model_name, num_test_cases, task):
+    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
+
+    profile_info = {profile: {"total_jobs_number": 0, "completed_jobs_number": 0, "surviving_mutants_number": 0} for profile in operator_profiles}
+
+    try:
+        if load_exclude_operators(working_dir):
+            print(f'[-] Skip [{working_dir}]: not a full operator profile run')
+            return None
+        with sqlite3.connect(f'{working_dir}/cosmic-ray.sqlite') as conn:
+            # Like cr-report, every work result counts as completed (NO_TEST and timeouts included)
+            mutations = conn.execute("SELECT m.operator_name, w.job_id IS NOT NULL, w.test_outcome FROM mutation_specs m LEFT JOIN work_results w ON m.job_id = w.job_id").fetchall()
+    except Exception as e:
+        print(f'[-] Error @ [{working_dir}]: {e}')
+        return None
+
+    for profile, patterns in operator_profiles.items():
+        exclude_matcher = match_operators(patterns)
+        for operator_name, completed, test_outcome in mutations:
+            if exclude_matcher and exclude_matcher.match(operator_name): continue
+            profile_info[profile]["total_jobs_number"] += 1
+            if completed:
+                profile_info[profile]["completed_jobs_number"] += 1
+            if test_outcome is not None and test_outcome.lower() == 'survived':
+                profile_info[profile]["surviving_mutants_number"] += 1
+
+    return profile_info
+
+def operator_profile_report(benchmark_name, model_generation_file, num_test_cases, baseline_test_cases=5):
+    """
+    Calibrates the operator profiles against completed full-profile runs.
+
+    For each profile, the mutants of the excluded operators are dropped from every task's
+    `mutation_specs` / `work_results`, and the surviving mutants rate is recomputed the same
+    way as `mutation_statistic`: the mean of the per-task rates over all correct tasks, where a
+    task that cannot be scored (no database, or not a full-profile run) counts as 0.
+
+    Returns:
+        A dictionary mapping each profile to its mutant count, mutant-count reduction,
+        surviving mutants rate and absolute / relative error against the full profile.
+    """
+    model_name = model_generation_file.split('/')[-1].split('.')[0]
+    correct_tasks = list()
+    correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{baseline_test_cases}_{model_name}'
+    
+    with open(correct_tasks_path, 'r') as f:
+        for line in f.readlines():  
+            correct_tasks.append(line.strip())
+    print(f'[+] ✅ Correct Tasks: {len(correct_tasks)}')
+
+    statistics = process_map(operator_profile_statistic_wrapper, [benchmark_name]*len(correct_tasks), [model_name]*len(correct_tasks), [num_test_cases]*len(correct_tasks), correct_tasks, desc=f"[+] 🔄 Calibrating operator profiles ({num_test_cases} test cases)...", chunksize=1)
+    statistics = [statistic for statistic in statistics if statistic is not None]
+    if len(statistics) < len(correct_tasks):
+        print(f'[-] Tasks without a full-profile run (scored as 0): {len(correct_tasks) - len(statistics)}')
+
+    report = dict()
+    for profile in operator_profiles:
+        total_jobs_number = sum(statistic[profile]["total_jobs_number"] for statistic in statistics)
+        surviving_mutants_rate = 0.0
+        for statistic in statistics:
+            completed_jobs_number = statistic[profile]["completed_jobs_number"]
+            surviving_mutants_rate += (statistic[profile]["surviving_mutants_number"] / completed_jobs_number) if completed_jobs_number > 0 else 0
+        surviving_mutants_rate = (surviving_mutants_rate / len(correct_tasks)) if len(correct_tasks) > 0 else 0.0
+        report[profile] = {"total_jobs_number": total_jobs_number, "surviving_mutants_rate": surviving_mutants_rate}
+
+    full_total_jobs_number = report["full"]["total_jobs_number"]
+    full_surviving_mutants_rate = report["full"]["surviving_mutants_rate"]
+    for profile, profile_report in report.items():
+        profile_report["mutant_reduction"] = (1 - profile_report["total_jobs_number"] / full_total_jobs_number) if full_total_jobs_number > 0 else 0.0
+        profile_report["absolute_error"] = abs(profile_report["surviving_mutants_rate"] - full_surviving_mutants_rate)
+        profile_report["relative_error"] = (profile_report["absolute_error"] / full_surviving_mutants_rate) if full_surviving_mutants_rate > 0 else 0.0
+        print(f'[+] 🧬 {profile:<10} Mutants: {profile_report["total_jobs_number"]} (Reduction: {profile_report["mutant_reduction"]:.2%}) | Surviving Mutants Rate: {profile_report["surviving_mutants_rate"]:.2%} (Error: {profile_report["absolute_error"]:.2%})')
+
+    with open(f'data/{benchmark_name}/operator_profile_report_tc_{num_test_cases}_{model_name}.json', 'w') as f:
+        f.write(json.dumps(report, indent=4))
+
+    return report
+
+class PytestOutcomeCollector:
+    """
+    A minimal pytest plugin that records the outcome of every collected test.
+    """
+    def __init__(self):
+        self.outcomes = dict()
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.outcomes[report.nodeid] = 'error'
+
+    def pytest_runtest_logreport(self, report):
+        # A failure in any phase (setup / call / teardown) fails the test
+        if report.failed:
+            self.outcomes[report.nodeid] = 'error' if report.when != 'call' else 'failed'
+        elif report.when == 'call' or report.skipped:
+            self.outcomes.setdefault(report.nodeid, report.outcome)
+
+def run_pytest_in_process(task_dir, test_file='test.py', coverage_source=None, timeout=30, keep_modules=False, cwd=None, plugins=None):
+    """
+    Runs pytest on a task inside the current interpreter, optionally under the coverage.py API.
+
+    The interpreter state touched by a task (cwd, sys.path, os.environ and the modules
+    loaded from the task directory) is restored afterwards, so many tasks can share a worker.
+
+    Args:
+        task_dir: The directory holding 'mod.py' and the test file.
+        test_file: The test file name, relative to task_dir.
+        coverage_source: The directory to measure, or None to skip coverage.
+        timeout: The wall-clock budget (seconds) of the whole pytest session.
+        keep_modules: Keep the task modules imported (the caller purges them later).
+        cwd: The working directory of the run, or None for a fresh temporary directory.
+        plugins: Extra pytest plugin objects for the session.
+
+    Returns:
+        A dictionary with the pytest exit code, the per-test outcomes, the timeout flag and the coverage.py JSON report.
+    """
+    abs_task_dir = os.path.abspath(task_dir)
+    collector = PytestOutcomeCollector()
+    timed_out = False
+    in_session = False
+    coverage_report = None
+
+    def on_timeout(signum, frame):
+        # pytest ends the session on KeyboardInterrupt, and unlike an Exception
+        # it is not swallowed by an `except Exception` in the code under test
+        nonlocal timed_out
+        if not in_session: return
+        timed_out = True
+        raise KeyboardInterrupt(f'Timeout after {timeout}s')
+
+    saved_cwd = os.getcwd()
+    saved_path = list(sys.path)
+    saved_environ = dict(os.environ)
+    saved_handler = signal.signal(signal.SIGALRM, on_timeout)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cov = None
+        if coverage_source is not None:
+            cov = coverage.Coverage(data_file=None, branch=True, source=[os.path.abspath(coverage_source)], config_file=False)
+        try:
+            os.chdir(cwd if cwd is not None else temp_dir)
+            sys.path.insert(0, abs_task_dir)
+            # Keep firing every second until the session is over
+            in_session = True
+            signal.setitimer(signal.ITIMER_REAL, timeout, 1)
+            if cov: cov.start()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                    exit_code = pytest.main([os.path.join(abs_task_dir, test_file), '-q', '-p', 'no:cacheprovider', '--import-mode=importlib', f'--rootdir={abs_task_dir}'], plugins=[collector] + (plugins or []))
+            except (Exception, KeyboardInterrupt):
+                # A repeated timeout signal can also hit pytest's own interrupt handling
+                if not timed_out: raise
+                exit_code = pytest.ExitCode.INTERRUPTED
+            finally:
+                in_session = False
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                if cov: cov.stop()
+            if cov:
+                coverage_json_path = os.path.join(temp_dir, 'coverage.json')
+                cov.json_report(outfile=coverage_json_path, ignore_errors=True)
+                with open(coverage_json_path, 'r') as f:
+                    coverage_report = json.loads(f.read())
+        finally:
+            signal.signal(signal.SIGALRM, saved_handler)
+            os.chdir(saved_cwd)
+            sys.path[:] = saved_path
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            if not keep_modules:
+                purge_task_modules(abs_task_dir)
+
+    return {'exit_code': int(exit_code), 'outcomes': collector.outcomes, 'timed_out': timed_out, 'coverage': coverage_report}
+
+def purge_task_modules(task_dir):
+    """
+    Drops every module loaded from `task_dir` from sys.modules, so the next task re-imports its own 'mod'.
+    """
+    abs_task_dir = os.path.abspath(task_dir)
+    for module_name, module in list(sys.modules.items()):
+        module_file = getattr(module, '__file__', None)
+        if module_file and os.path.abspath(module_file).startswith(abs_task_dir + os.sep):
+            del sys.modules[module_name]
+
+def parse_coverage_report(coverage_report: dict, outcomes: dict, source_code_path: str) -> dict:
+    """
+    Converts the coverage.py JSON report and the per-test outcomes of a task into a result dictionary.
+
+    Args:
+        coverage_report: The output of `Coverage.json_report`.
+        outcomes: The mapping from pytest node id to test outcome.
+        source_code_path: The measured directory, used to relativize file names.
+
+    Returns:
+        A dictionary with the same metrics as `parse_pytest_output`, plus line- and branch-level coverage per file.
+    """
+    passed_count = sum(1 for outcome in outcomes.values() if outcome == 'passed')
+    failed_count = sum(1 for outcome in outcomes.values() if outcome in ('failed', 'error'))
+    total_tests = passed_count + failed_count
+    pass_rate = (passed_count / total_tests) * 100 if total_tests > 0 else 0.0
+
+    files = dict()
+    totals = dict()
+    if coverage_report:
+        totals = coverage_report['totals']
+        for file_path, file_report in coverage_report['files'].items():
+            files[os.path.relpath(file_path, source_code_path)] = {
+                "executed_lines": file_report['executed_lines'],
+                "missing_lines": file_report['missing_lines'],
+                "executed_branches": file_report.get('executed_branches', []),
+                "missing_branches": file_report.get('missing_branches', []),
+                "summary": file_report['summary'],
+            }
+
+    return {
+        "total_coverage_percent": round(totals.get('percent_covered', 0)),
+        "line_coverage": {"covered": totals.get('covered_lines', 0), "total": totals.get('num_statements', 0)},
+        "branch_coverage": {"covered": totals.get('covered_branches', 0), "total": totals.get('num_branches', 0)},
+        "pass_rate_percent": round(pass_rate, 2),
+        "passed_tests": passed_count,
+        "failed_tests": failed_count,
+        "total_tests": total_tests,
+        "tests": outcomes,
+        "files": files,
+    }
+
 def pytest_run_wrapper(benchmark_name, model_name, task_id):
     test_file_path = f'data/{benchmark_name}_mods/{model_name}/{task_id}/test.py'
     source_code_path = f'data/{benchmark_name}_mods/{model_name}/{task_id}'
@@ -339,14 +868,40 @@ def pytest_run_wrapper(benchmark_name, model_name, task_id):
     except Exception as e:
         return {'model_name': model_name, 'task': task_id, 'result': None, "status": "error"}
 
-def pytest_run(benchmark_name, model_name):
+def pytest_coverage_run_wrapper(benchmark_name, model_name, task_id):
+    source_code_path = os.path.abspath(f'data/{benchmark_name}_mods/{model_name}/{task_id}')
+    try:
+        run = run_pytest_in_process(source_code_path, 'test.py', coverage_source=source_code_path, timeout=30)
+        if run['timed_out']:
+            return {'model_name': model_name, 'task': task_id, 'result': None, "status": "timeout"}
+        result_dict = parse_coverage_report(run['coverage'], run['outcomes'], source_code_path)
+        return {'model_name': model_name, 'task': task_id, 'result': result_dict, "status": "success"}
+    except Exception as e:
+        return {'model_name': model_name, 'task': task_id, 'result': None, "status": "error"}
+
+def pytest_run(benchmark_name, model_name, engine='subprocess', batch_size=16):
+    """
+    Runs the tests of every task with branch coverage and writes 'results.jsonl'.
+
+    Args:
+        engine: 'subprocess' runs one `pytest --cov` process per task and scrapes its report;
+                'in_process' runs batches of `batch_size` tasks per worker interpreter with the coverage.py API,
+                and also records per-test outcomes and per-file line / branch data.
+    """
     tasks = list()
     
     for task in os.listdir(f'data/{benchmark_name}_mods/{model_name}'):
         if task.startswith('task_'):
-            tasks.append((model_name, task))
-            
-    results = process_map(pytest_run_wrapper, tasks, desc="[+] 🔄 Running pytest", chunksize=1)
+            tasks.append(task)
+
+    if engine == 'in_process':
+        # A task crashing its worker interpreter only loses its own result, and a task stuck
+        # where the in-process timeout cannot interrupt it (e.g. inside a C call) is killed
+        crash_result = lambda benchmark_name, model_name, task_id: {'model_name': model_name, 'task': task_id, 'result': None, "status": "crash"}
+        timeout_result = lambda benchmark_name, model_name, task_id: {'model_name': model_name, 'task': task_id, 'result': None, "status": "timeout"}
+        results = process_map_isolated(pytest_coverage_run_wrapper, [(benchmark_name, model_name, task) for task in tasks], crash_result, batch_size=batch_size, desc="[+] 🔄 Running pytest (in-process coverage)", task_timeout=30, timeout_result=timeout_result)
+    else:
+        results = process_map(pytest_run_wrapper, [benchmark_name]*len(tasks), [model_name]*len(tasks), tasks, desc="[+] 🔄 Running pytest", chunksize=1)
     
     with open(f'data/{benchmark_name}_mods/{model_name}/results.jsonl', 'w') as f:
         for result in results:
@@ -387,9 +942,12 @@ if __name__ == "__main__":
         # model_generation_file_path = 'data/testbench_generation/TestBench_CodeLlama-7b-Instruct-hf_mutants.jsonl'
         model_generation_file_path = 'data/testbench_generation/TestBench_datasetv6.jsonl'
 
-        # cosmic_ray_init(args.benchmark_name, model_generation_file_path, timeout=10, num_samples=args.num_samples, num_test_cases=num_test_cases)
+        # cosmic_ray_init(args.benchmark_name, model_generation_file_path, timeout=10, num_samples=args.num_samples, num_test_cases=num_test_cases, operator_profile='full')
         # cosmic_ray_setup(args.benchmark_name, model_generation_file_path, num_test_cases=num_test_cases)
+        # cosmic_ray_two_phase_setup(args.benchmark_name, model_generation_file_path, test_case_counts=(5, 2, 1), timeout=10, num_samples=args.num_samples)
         # mutation_status(args.benchmark_name, model_generation_file_path, num_test_cases=num_test_cases)
         # mutation_run(args.benchmark_name, model_generation_file_path, num_test_cases)
+        # mutation_run(args.benchmark_name, model_generation_file_path, num_test_cases, metrics_port=9464, metrics_file=f'data/{args.benchmark_name}/metrics.prom')
         mutation_statistic(args.benchmark_name, model_generation_file_path, num_test_cases, baseline_test_cases=5)
+        # operator_profile_report(args.benchmark_name, model_generation_file_path, num_test_cases, baseline_test_cases=5)
 
@@ -0,0 +1,274 @@
+# coding: utf-8
+
+# Date: 2026-10-19
+# Description: Live throughput metrics for long-running mutation sweeps, in Prometheus text format.
+#
+# Workers tail the rows that `cosmic-ray exec` appends to their task's 'cosmic-ray.sqlite'
+# (by rowid, so nothing is re-scanned) and push the deltas onto a shared queue. The exporter
+# aggregates them per (model, num_test_cases) and serves them over a local HTTP endpoint
+# and / or a periodically rewritten file.
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+import subprocess
+import urllib.request
+from collections import deque, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+OUTCOMES = ['done', 'killed', 'survived', 'timeout', 'incompetent']
+
+class TaskProgressTracker:
+    """
+    Reports the progress of one `cosmic-ray exec` run to the exporter queue.
+    """
+    def __init__(self, metrics_queue, db_path, model_name, num_test_cases, task):
+        self.metrics_queue = metrics_queue
+        self.db_path = db_path
+        self.labels = (model_name, num_test_cases)
+        self.task = task
+        self.last_rowid = 0
+
+    def connect(self, **kwargs):
+        # Read-only: a missing database must fail instead of being created empty
+        return sqlite3.connect(f'file:{urllib.request.pathname2url(os.path.abspath(self.db_path))}?mode=ro', uri=True, **kwargs)
+
+    def start(self):
+        with self.connect() as conn:
+            total_mutants = conn.execute("SELECT COUNT(*) FROM mutation_specs").fetchone()[0]
+            completed_mutants, last_rowid = conn.execute("SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM work_results").fetchone()
+        conn.close()
+        self.last_rowid = last_rowid
+        self.metrics_queue.put(('task_start', self.labels, self.task, total_mutants - completed_mutants))
+
+    def skip(self):
+        self.metrics_queue.put(('task_skipped', self.labels, self.task, None))
+
+    def poll(self):
+        with self.connect(timeout=1) as conn:
+            rows = conn.execute("SELECT rowid, worker_outcome, test_outcome, output = 'timeout' FROM work_results WHERE rowid > ? ORDER BY rowid", (self.last_rowid,)).fetchall()
+        conn.close()
+        if not rows: return
+
+        counts = dict.fromkeys(OUTCOMES, 0)
+        for rowid, worker_outcome, test_outcome, timed_out in rows:
+            counts['done'] += 1
+            # `killed` follows cr-report (timeouts are killed mutants); `timeout` counts them separately
+            if test_outcome is not None and test_outcome.lower() in counts:
+                counts[test_outcome.lower()] += 1
+            # cosmic-ray 8 records a timeout as a killed mutant with 'timeout' output (older versions as a worker outcome)
+            if timed_out or (worker_outcome is not None and worker_outcome.lower() == 'timeout'):
+                counts['timeout'] += 1
+        self.last_rowid = rows[-1][0]
+        self.metrics_queue.put(('mutants', self.labels, self.task, counts))
+
+    def finish(self):
+        try:
+            self.poll()
+        except sqlite3.Error:
+            pass
+        self.metrics_queue.put(('task_end', self.labels, self.task, None))
+
+def run_with_progress(cmd, cwd, timeout, tracker, poll_interval=2.0):
+    """
+    Same contract as `subprocess.run(cmd, cwd=cwd, check=True, timeout=timeout)`,
+    polling `tracker` while the process runs.
+    """
+    try:
+        tracker.start()
+    except Exception as e:
+        # The task database cannot be read (missing, locked, ...): report the task as skipped, so
+        # the queue depth and the remaining mutants stay consistent, and run it untracked
+        tracker.skip()
+        subprocess.run(cmd, cwd=cwd, check=True, timeout=timeout)
+        return
+
+    try:
+        process = subprocess.Popen(cmd, cwd=cwd)
+        deadline = time.time() + timeout
+        while True:
+            try:
+                process.wait(timeout=poll_interval)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            try:
+                tracker.poll()
+            except sqlite3.Error:
+                pass
+            if time.time() > deadline:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    finally:
+        tracker.finish()
+
+class MetricsExporter:
+    """
+    Aggregates the tracker events and exposes them in Prometheus text format.
+
+    Args:
+        metrics_queue: The queue the workers' trackers write to (e.g. `multiprocessing.Manager().Queue()`).
+        max_workers: The size of the worker pool, for the utilization gauge.
+        port: Serve the metrics on http://127.0.0.1:{port}/metrics, or None.
+        file_path: Rewrite the metrics to this file every `interval` seconds, or None.
+        window: The sliding window (seconds) of the per-second rates.
+    """
+    def __init__(self, metrics_queue, max_workers, port=None, file_path=None, interval=10.0, window=60.0):
+        self.metrics_queue = metrics_queue
+        self.max_workers = max_workers
+        self.port = port
+        self.file_path = file_path
+        self.interval = interval
+        self.window = window
+
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: dict.fromkeys(OUTCOMES, 0))
+        self.history = defaultdict(deque)
+        self.tasks_total = defaultdict(int)
+        self.tasks_started = defaultdict(int)
+        self.tasks_run = defaultdict(int)
+        self.tasks_finished = defaultdict(int)
+        self.mutants_started = defaultdict(int)
+        self.mutants_remaining = defaultdict(int)
+        self.task_mutants_remaining = dict()
+        self.busy_workers = 0
+
+        self.stop_event = threading.Event()
+        self.consumer = threading.Thread(target=self.consume, daemon=True)
+        self.server = None
+
+    def register_tasks(self, model_name, num_test_cases, number_of_tasks):
+        with self.lock:
+            self.tasks_total[(model_name, num_test_cases)] += number_of_tasks
+            # Zero sample, so the first rates are measured from the registration time
+            self.history[(model_name, num_test_cases)].append((time.time(), dict.fromkeys(OUTCOMES, 0)))
+
+    def start(self):
+        self.consumer.start()
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = exporter.render().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            print(f'[+] 📈 Metrics: http://127.0.0.1:{self.port}/metrics')
+        if self.file_path is not None:
+            print(f'[+] 📈 Metrics: {self.file_path}')
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.consumer.join()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.write_file()
+
+    def consume(self):
+        last_write = time.time()
+        while True:
+            try:
+                self.handle(*self.metrics_queue.get(timeout=0.5))
+            except queue.Empty:
+                if self.stop_event.is_set(): break
+            if self.file_path is not None and time.time() - last_write >= self.interval:
+                self.write_file()
+                last_write = time.time()
+
+    def handle(self, event, labels, task, payload):
+        with self.lock:
+            if event == 'task_start':
+                self.tasks_started[labels] += 1
+                self.tasks_run[labels] += 1
+                self.mutants_started[labels] += payload
+                self.mutants_remaining[labels] += payload
+                self.task_mutants_remaining[(labels, task)] = payload
+                self.busy_workers += 1
+            elif event == 'task_skipped':
+                self.tasks_started[labels] += 1
+                self.tasks_finished[labels] += 1
+            elif event == 'task_end':
+                self.tasks_finished[labels] += 1
+                # Mutants left over by a timed-out run are not pending anymore
+                self.mutants_remaining[labels] -= self.task_mutants_remaining.pop((labels, task), 0)
+                self.busy_workers -= 1
+            elif event == 'mutants':
+                for outcome, count in payload.items():
+                    self.counters[labels][outcome] += count
+                done = min(payload['done'], self.task_mutants_remaining.get((labels, task), 0))
+                self.mutants_remaining[labels] -= done
+                if (labels, task) in self.task_mutants_remaining:
+                    self.task_mutants_remaining[(labels, task)] -= done
+                self.history[labels].append((time.time(), dict(self.counters[labels])))
+
+    def rates(self, labels, now):
+        # Per-second rates over the sliding window
+        history = self.history[labels]
+        while len(history) > 1 and history[1][0] <= now - self.window:
+            history.popleft()
+        if not history: return dict.fromkeys(OUTCOMES, 0.0)
+        first_time, first_counters = history[0]
+        elapsed = max(now - first_time, 1.0)
+        return {outcome: (self.counters[labels][outcome] - first_counters[outcome]) / elapsed for outcome in OUTCOMES}
+
+    def render(self):
+        now = time.time()
+        lines = list()
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        with self.lock:
+            keys = sorted(set(self.tasks_total) | set(self.counters), key=str)
+            label_sets = {key: {"model": key[0], "num_test_cases": key[1]} for key in keys}
+            rates = {key: self.rates(key, now) for key in keys}
+
+            for outcome in OUTCOMES:
+                metric(f'ray_mutants_{outcome}_total', 'counter', f'Mutants {outcome} since the sweep started.', [(label_sets[key], self.counters[key][outcome]) for key in keys])
+            metric('ray_mutants_per_second', 'gauge', f'Mutants per second over the last {int(self.window)}s.', [({**label_sets[key], "outcome": outcome}, round(rates[key][outcome], 4)) for key in keys for outcome in OUTCOMES])
+            metric('ray_tasks_total', 'gauge', 'Tasks scheduled in the sweep.', [(label_sets[key], self.tasks_total[key]) for key in keys])
+            metric('ray_tasks_finished_total', 'counter', 'Tasks finished (including the already completed ones).', [(label_sets[key], self.tasks_finished[key]) for key in keys])
+            metric('ray_queue_depth', 'gauge', 'Tasks waiting for a worker.', [(label_sets[key], self.tasks_total[key] - self.tasks_started[key]) for key in keys])
+
+            eta_samples = list()
+            remaining_samples = list()
+            for key in keys:
+                mean_mutants = (self.mutants_started[key] / self.tasks_run[key]) if self.tasks_run[key] > 0 else 0
+                remaining = self.mutants_remaining[key] + mean_mutants * (self.tasks_total[key] - self.tasks_started[key])
+                remaining_samples.append((label_sets[key], round(remaining)))
+                eta_samples.append((label_sets[key], round(remaining / rates[key]['done']) if rates[key]['done'] > 0 else -1))
+            metric('ray_mutants_remaining', 'gauge', 'Mutants left, estimating unstarted tasks from the mean of the started ones.', remaining_samples)
+            metric('ray_eta_seconds', 'gauge', 'Estimated seconds to finish (-1 while unknown).', eta_samples)
+
+            metric('ray_workers_busy', 'gauge', 'Workers running a task.', [(dict(), self.busy_workers)])
+            metric('ray_worker_utilization', 'gauge', 'Busy workers / pool size.', [(dict(), round(self.busy_workers / self.max_workers, 4) if self.max_workers else 0)])
+
+        return '\n'.join(lines) + '\n'
+
+    def write_file(self):
+        if self.file_path is None: return
+        # Write-then-rename, so scrapers never read a half-written file
+        temp_path = f'{self.file_path}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(temp_path, self.file_path)
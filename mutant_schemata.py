@@ -0,0 +1,652 @@
+# coding: utf-8
+
+# Date: 2026-10-19
+# Description: Mutant schemata - compile all of a task's mutants into one switchable module.
+#
+# Each mutant of `mutation_specs` is generated with the cosmic-ray operators and compiled once, as a
+# branch of the function (or method) it mutates: the mutated function's body becomes
+# `if _ray_mutant_id == N: <body of mutant N> ... else: <original body>`, where `_ray_mutant_id` is a
+# module global initialized from the RAY_MUTANT_ID environment variable. The function object stays
+# the same, so aliases, registries, default arguments and decorators all see the active mutant.
+# Switching mutants is a global assignment: no re-parse, re-compile or re-import.
+#
+# Left pending for `cosmic-ray exec`:
+# - mutants outside a function body (module-level code, class attributes, class headers, signatures)
+# - mutants of functions that may run while 'mod.py' is imported, since their results are frozen in then
+# - mutants that change which names of the function are local, or whether it is a generator
+#
+# All mutants of a task run in the same imported module, so the module state (globals, class attributes,
+# function defaults, memo containers, functools caches) is snapshotted once the tests are collected and
+# restored before every mutant (see `ModuleState`). State it cannot reach still carries over from one
+# mutant to the next: other objects (numpy arrays, instances of classes from other modules, ...), other
+# modules' attributes, files, ...
+
+import os
+import ast
+import sys
+import json
+import time
+import types
+import pytest
+import random
+import shutil
+import signal
+import sqlite3
+import difflib
+import tomllib
+import symtable
+import importlib
+import contextlib
+from _pytest.runner import runtestprotocol
+from cosmic_ray.plugins import get_operator
+from cosmic_ray.mutating import mutate_code
+from collections import deque, defaultdict
+from main import run_pytest_in_process, purge_task_modules, process_map_isolated
+
+MUTANT_ID_ENV = 'RAY_MUTANT_ID'
+
+schemata_header = """
+import os as _ray_os
+_ray_mutant_id = int(_ray_os.environ.get('{mutant_id_env}', '-1'))
+"""
+
+function_types = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+def load_mutation_specs(db_path):
+    with sqlite3.connect(db_path) as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(mutation_specs)")]
+        operator_args = 'operator_args' if 'operator_args' in columns else "'{}'"
+        mutations = conn.execute(f"SELECT job_id, module_path, operator_name, {operator_args}, occurrence FROM mutation_specs ORDER BY job_id").fetchall()
+    conn.close()
+
+    specs = list()
+    for job_id, module_path, operator_name, operator_args, occurrence in mutations:
+        # cosmic-ray stores the operator arguments as a JSON-encoded JSON string
+        operator_args = json.loads(operator_args) if operator_args else {}
+        if isinstance(operator_args, str): operator_args = json.loads(operator_args)
+        specs.append({"job_id": job_id, "module_path": module_path, "operator_name": operator_name, "operator_args": operator_args or {}, "occurrence": occurrence})
+    return specs
+
+def make_diff(original_code, mutated_code, module_path):
+    # Same format as the `diff` cosmic-ray stores in `work_results`
+    diff = ["--- mutation diff ---"]
+    diff += difflib.unified_diff(original_code.split("\n"), mutated_code.split("\n"), fromfile="a/" + module_path, tofile="b/" + module_path, lineterm="")
+    return "\n".join(diff)
+
+def is_docstring(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+def function_header(node):
+    return (type(node).__name__, node.name, ast.dump(node.args), [ast.dump(decorator) for decorator in node.decorator_list], ast.dump(node.returns) if node.returns else None)
+
+def function_scope(node):
+    # The local / global / nonlocal names of a function as the compiler sees them, and whether it is a generator
+    table = symtable.symtable(ast.unparse(node), '<schemata>', 'exec').get_children()[0]
+    symbols = table.get_symbols()
+    own_scope = list(node.body)
+    is_generator = False
+    while own_scope:
+        child = own_scope.pop()
+        if isinstance(child, (ast.Yield, ast.YieldFrom)): is_generator = True
+        if not isinstance(child, function_types + (ast.ClassDef, ast.Lambda)):
+            own_scope.extend(ast.iter_child_nodes(child))
+    return (
+        {symbol.get_name() for symbol in symbols if symbol.is_local()},
+        {symbol.get_name() for symbol in symbols if symbol.is_declared_global()},
+        {symbol.get_name() for symbol in symbols if symbol.is_nonlocal()},
+        is_generator,
+    )
+
+def find_mutated_unit(original_tree, mutated_tree):
+    """
+    Finds the function or method a mutant changes, by comparing the top-level statements
+    (and the members of top-level classes) of the original and the mutated module.
+
+    Returns:
+        A tuple (unit, path, mutated function node): unit is 'name' or 'Class.name' and path the indices
+        of the function in the module / class bodies; (None, None, None) for an equivalent mutant.
+        Raises ValueError when the mutant cannot be switched at runtime.
+    """
+    def changed(original_body, mutated_body):
+        if len(original_body) != len(mutated_body):
+            raise ValueError('statements added or removed')
+        return [(index, a, b) for index, (a, b) in enumerate(zip(original_body, mutated_body)) if ast.dump(a) != ast.dump(b)]
+
+    changes = changed(original_tree.body, mutated_tree.body)
+    if not changes: return (None, None, None)
+    if len(changes) > 1: raise ValueError('several statements changed')
+    index, original_node, mutated_node = changes[0]
+
+    if isinstance(original_node, function_types) and isinstance(mutated_node, function_types):
+        if function_header(original_node) != function_header(mutated_node):
+            raise ValueError('function signature changed')
+        return (original_node.name, (index,), mutated_node)
+
+    if isinstance(original_node, ast.ClassDef) and isinstance(mutated_node, ast.ClassDef) and original_node.name == mutated_node.name:
+        if ast.dump(ast.ClassDef(original_node.name, original_node.bases, original_node.keywords, [], original_node.decorator_list)) != ast.dump(ast.ClassDef(mutated_node.name, mutated_node.bases, mutated_node.keywords, [], mutated_node.decorator_list)):
+            raise ValueError('class header changed')
+        member_changes = changed(original_node.body, mutated_node.body)
+        if len(member_changes) != 1: raise ValueError('several class members changed')
+        member_index, original_member, mutated_member = member_changes[0]
+        if not (isinstance(original_member, function_types) and isinstance(mutated_member, function_types)):
+            raise ValueError('class attribute changed')
+        if function_header(original_member) != function_header(mutated_member):
+            raise ValueError('method signature changed')
+        return (f'{original_node.name}.{original_member.name}', (index, member_index), mutated_member)
+
+    raise ValueError('module-level statement changed')
+
+def import_time_units(tree):
+    """
+    Finds the functions and methods that may run while the module is imported.
+
+    A name loaded by module-level code, class bodies, decorators or signatures counts as called, unless
+    its value is only stored (`alias = f`, `registry = {'f': f}`, `def g(callback=f)`): then it counts as
+    called once the name it is stored under does. A called function calls the names of its body, and a
+    called class all of its methods.
+    """
+    units = defaultdict(set)
+    references = defaultdict(set)
+    called = set()
+
+    def loaded_names(nodes):
+        return {child.id for node in nodes for child in ast.walk(node) if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)}
+
+    def stored_names(node):
+        # The names of a value that is only stored (a name, or a container literal of names), or None
+        if isinstance(node, ast.Name): return {node.id}
+        if isinstance(node, ast.Constant): return set()
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)): elements = node.elts
+        elif isinstance(node, ast.Dict): elements = [key for key in node.keys if key is not None] + node.values
+        else: return None
+        names = set()
+        for element in elements:
+            element_names = stored_names(element)
+            if element_names is None: return None
+            names |= element_names
+        return names
+
+    def base_name(target):
+        while isinstance(target, (ast.Attribute, ast.Subscript, ast.Starred)):
+            target = target.value
+        return target.id if isinstance(target, ast.Name) else None
+
+    def store_or_call(owner, value):
+        names = stored_names(value)
+        if names is None: called.update(loaded_names([value]))
+        else: references[owner].update(names)
+
+    def scan(body, owner=None):
+        for node in body:
+            if isinstance(node, function_types):
+                name = node.name if owner is None else owner
+                units[name].add(node.name if owner is None else f'{owner}.{node.name}')
+                called.update(loaded_names(node.decorator_list))
+                signature = node.args.defaults + [default for default in node.args.kw_defaults if default is not None]
+                signature += [arg.annotation for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs + [node.args.vararg, node.args.kwarg] if arg is not None and arg.annotation is not None]
+                for value in signature + ([node.returns] if node.returns else []):
+                    store_or_call(name, value)
+                references[name].update(loaded_names(node.body))
+            elif isinstance(node, ast.ClassDef) and owner is None:
+                called.update(loaded_names(node.decorator_list + node.bases + node.keywords))
+                scan(node.body, owner=node.name)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)) and node.value is not None and stored_names(node.value) is not None:
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for target in targets:
+                    bases = {base_name(element) for element in (target.elts if isinstance(target, (ast.Tuple, ast.List)) else [target])}
+                    for base in bases - {None}:
+                        references[base if owner is None else owner].update(stored_names(node.value))
+                    called.update(loaded_names([target]) - bases)
+            else:
+                called.update(loaded_names([node]))
+
+    scan(tree.body)
+
+    import_time = set()
+    visited = set()
+    pending = set(called)
+    while pending:
+        name = pending.pop()
+        if name in visited: continue
+        visited.add(name)
+        import_time |= units[name]
+        pending |= references[name]
+    return import_time
+
+class DeclarationHoister(ast.NodeTransformer):
+    """
+    Takes the global / nonlocal declarations out of a function body (they apply to the whole function
+    wherever they are), so several bodies can share one function.
+    """
+    def __init__(self):
+        self.declarations = list()
+
+    def visit_Global(self, node):
+        self.declarations.append(node)
+        return ast.Pass()
+
+    visit_Nonlocal = visit_Global
+
+    def visit_FunctionDef(self, node):
+        # Nested scopes keep their own declarations
+        return node
+
+    visit_AsyncFunctionDef = visit_ClassDef = visit_Lambda = visit_FunctionDef
+
+def schemata_body(function_node, variants):
+    """
+    Builds the body of a function switching between its original body and the mutant bodies of `variants` ({mutant_id: body}).
+    """
+    def split(body):
+        docstring = body[:1] if body and is_docstring(body[0]) else []
+        hoister = DeclarationHoister()
+        statements = [hoister.visit(statement) for statement in body[len(docstring):]]
+        statements = [statement for statement in statements if not isinstance(statement, ast.Pass) or statement in body]
+        return docstring, hoister.declarations, statements or [ast.Pass()]
+
+    def dispatch(mutant_ids):
+        # Binary search on the mutant ID keeps the nesting depth logarithmic
+        if len(mutant_ids) == 1: return bodies[mutant_ids[0]]
+        middle = len(mutant_ids) // 2
+        test = ast.Compare(ast.Name('_ray_mutant_id', ast.Load()), [ast.Lt()], [ast.Constant(mutant_ids[middle])])
+        return [ast.If(test, dispatch(mutant_ids[:middle]), dispatch(mutant_ids[middle:]))]
+
+    docstring, declarations, original_statements = split(function_node.body)
+    bodies = {mutant_id: split(body)[2] for mutant_id, body in variants.items()}
+    mutant_ids = sorted(bodies)
+
+    hoisted = list()
+    for declaration_type in (ast.Global, ast.Nonlocal):
+        names = sorted({name for declaration in declarations if isinstance(declaration, declaration_type) for name in declaration.names})
+        if names: hoisted.append(declaration_type(names))
+
+    test = ast.Compare(ast.Name('_ray_mutant_id', ast.Load()), [ast.In()], [ast.Set([ast.Constant(mutant_id) for mutant_id in mutant_ids])])
+    return docstring + hoisted + [ast.If(test, dispatch(mutant_ids), original_statements)]
+
+def build_schemata(working_dir):
+    """
+    Rewrites a task's 'mod.py' into a meta-mutant holding every switchable mutant of its 'cosmic-ray.sqlite'.
+
+    Returns:
+        A tuple (meta-mutant source code, mutants), where each mutant is a dictionary with its
+        `mutant_id`, `job_id`, `status` ('schema', 'equivalent', 'no_test' or 'unsupported') and `diff`.
+    """
+    with open(f'{working_dir}/mod.py', 'r') as f:
+        original_code = f.read()
+    original_tree = ast.parse(original_code)
+    import_time = import_time_units(original_tree)
+
+    mutants = list()
+    variants = dict()
+    scopes = dict()
+
+    for mutant_id, spec in enumerate(load_mutation_specs(f'{working_dir}/cosmic-ray.sqlite')):
+        mutant = {"mutant_id": mutant_id, "job_id": spec["job_id"], "module_path": spec["module_path"], "status": "unsupported", "diff": None}
+        mutants.append(mutant)
+        if os.path.basename(spec["module_path"]) != 'mod.py': continue
+
+        try:
+            operator = get_operator(spec["operator_name"])(**spec["operator_args"])
+            mutated_code = mutate_code(original_code, operator, spec["occurrence"])
+        except Exception as e:
+            continue
+        if mutated_code is None:
+            mutant["status"] = "no_test"
+            continue
+        mutant["diff"] = make_diff(original_code, mutated_code, spec["module_path"])
+
+        try:
+            unit, path, mutated_node = find_mutated_unit(original_tree, ast.parse(mutated_code))
+        except (SyntaxError, ValueError) as e:
+            continue
+        if unit is None:
+            mutant["status"] = "equivalent"
+            continue
+        if unit in import_time: continue
+
+        # The mutant body must see the same local / global names as the original one it shares the function with
+        try:
+            if path not in scopes:
+                original_node = original_tree.body[path[0]] if len(path) == 1 else original_tree.body[path[0]].body[path[1]]
+                scopes[path] = function_scope(original_node)
+            if function_scope(mutated_node) != scopes[path]: continue
+        except SyntaxError as e:
+            continue
+
+        variants.setdefault(path, dict())[mutant_id] = mutated_node.body
+        mutant["status"] = "schema"
+
+    schemata_tree = ast.parse(original_code)
+    for path, unit_variants in variants.items():
+        function_node = schemata_tree.body[path[0]] if len(path) == 1 else schemata_tree.body[path[0]].body[path[1]]
+        function_node.body = schemata_body(function_node, unit_variants)
+
+    # The mutant ID is defined first, so it exists whenever a function runs (only a docstring and the __future__ imports can precede it)
+    position = 0
+    while position < len(schemata_tree.body) and ((position == 0 and is_docstring(schemata_tree.body[0])) or (isinstance(schemata_tree.body[position], ast.ImportFrom) and schemata_tree.body[position].module == '__future__')):
+        position += 1
+    schemata_tree.body[position:position] = ast.parse(schemata_header.format(mutant_id_env=MUTANT_ID_ENV)).body
+
+    return ast.unparse(ast.fix_missing_locations(schemata_tree)) + '\n', mutants
+
+class ModuleState:
+    """
+    Snapshot of the state the mutants can change in the meta-mutant: its global bindings, the attributes of
+    its classes, the defaults of its functions, the contents of every mutable container (dict, list, set,
+    deque, bytearray) and instance reachable from those, and its functools caches.
+
+    `restore` puts everything back in place, with the original objects, so the references held elsewhere
+    (e.g. by the test module after `from mod import *`) see the restored state as well.
+    """
+    atomic_types = (str, bytes, int, float, complex, bool, type(None))
+
+    def __init__(self, module):
+        self.module = module
+        self.bindings = dict(vars(module))
+        self.classes = list()
+        self.defaults = list()
+        self.containers = list()
+        self.caches = list()
+
+        visited = set()
+        pending = [value for name, value in self.bindings.items() if not name.startswith('__')]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, self.atomic_types) or id(value) in visited: continue
+            visited.add(id(value))
+
+            if isinstance(value, dict):
+                self.containers.append((value, dict(value)))
+                pending += list(value.values())
+            elif isinstance(value, (list, set, deque, bytearray)):
+                self.containers.append((value, list(value)))
+                pending += list(value)
+            elif isinstance(value, (tuple, frozenset)):
+                pending += list(value)
+            elif isinstance(value, (staticmethod, classmethod)):
+                pending.append(value.__func__)
+            elif self.defined_here(value) and isinstance(value, type):
+                self.classes.append((value, dict(vars(value))))
+                pending += [attribute for name, attribute in vars(value).items() if not name.startswith('__')]
+            elif self.defined_here(value) and isinstance(value, types.FunctionType):
+                self.defaults.append((value, value.__defaults__, value.__kwdefaults__))
+                pending += list(value.__defaults__ or ()) + list((value.__kwdefaults__ or {}).values())
+            elif callable(getattr(value, 'cache_clear', None)):
+                # functools.lru_cache / functools.cache
+                self.caches.append(value)
+                pending.append(getattr(value, '__wrapped__', None))
+            elif self.defined_here(type(value)) and isinstance(getattr(value, '__dict__', None), dict):
+                pending.append(vars(value))
+
+    def defined_here(self, value):
+        return getattr(value, '__module__', None) == self.module.__name__
+
+    def restore(self):
+        module_dict = vars(self.module)
+        for name in set(module_dict) - set(self.bindings):
+            del module_dict[name]
+        for name, value in self.bindings.items():
+            if name not in module_dict or module_dict[name] is not value:
+                module_dict[name] = value
+
+        for cls, attributes in self.classes:
+            for name in set(vars(cls)) - set(attributes):
+                delattr(cls, name)
+            for name, value in attributes.items():
+                if name not in vars(cls) or vars(cls)[name] is not value:
+                    setattr(cls, name, value)
+
+        for function, defaults, kwdefaults in self.defaults:
+            function.__defaults__, function.__kwdefaults__ = defaults, kwdefaults
+
+        for container, saved in self.containers:
+            if isinstance(container, dict):
+                if len(container) == len(saved) and all(key in container and container[key] is value for key, value in saved.items()): continue
+                container.clear()
+                container.update(saved)
+            elif isinstance(container, (set, deque)):
+                if len(container) == len(saved) and all(a is b for a, b in zip(container, saved)): continue
+                container.clear()
+                container.update(saved) if isinstance(container, set) else container.extend(saved)
+            else:
+                if len(container) == len(saved) and all(a is b for a, b in zip(container, saved)): continue
+                container[:] = saved
+
+        for cache in self.caches:
+            cache.cache_clear()
+
+class MutantTimeout(KeyboardInterrupt):
+    pass
+
+class SchemataRunner:
+    """
+    A pytest plugin that runs the collected tests once per mutant inside a single session,
+    so the tests are collected (and the meta-mutant imported) only once per task.
+    A mutant is killed by the first failing test, or by a timeout.
+    """
+    def __init__(self, schemata_module, mutant_ids, timeout):
+        self.schemata_module = schemata_module
+        self.mutant_ids = mutant_ids
+        self.timeout = timeout
+        self.outcomes = dict()
+        self.running = False
+
+    def on_timeout(self, signum, frame):
+        if self.running: raise MutantTimeout(f'Timeout after {self.timeout}s')
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtestloop(self, session):
+        # Let pytest report collection errors
+        if session.testsfailed: return None
+
+        # Only pass / fail matters: formatting deep tracebacks (e.g. RecursionError) against the large
+        # meta-mutant source would otherwise cost seconds per mutant
+        session.config.option.tbstyle = 'no'
+
+        # Every mutant starts from the state the module had once the tests were collected, as in a fresh process
+        state = ModuleState(self.schemata_module)
+
+        # Pause the session timer while the mutants are timed one by one, and resume it afterwards
+        saved_handler = signal.signal(signal.SIGALRM, self.on_timeout)
+        saved_timer = signal.setitimer(signal.ITIMER_REAL, 0)
+        try:
+            for mutant_id in self.mutant_ids:
+                try:
+                    state.restore()
+                except Exception as e:
+                    # The remaining mutants stay pending for cosmic-ray
+                    break
+                self.schemata_module._ray_mutant_id = mutant_id
+                killed, timed_out = False, False
+                try:
+                    try:
+                        # Keep firing every second in case the mutant swallows the interrupt
+                        self.running = True
+                        signal.setitimer(signal.ITIMER_REAL, self.timeout, 1)
+                        for item in session.items:
+                            if any(report.failed for report in runtestprotocol(item, log=False, nextitem=None)):
+                                killed = True
+                                break
+                    finally:
+                        self.running = False
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+                except MutantTimeout:
+                    killed, timed_out = True, True
+                if timed_out:
+                    # Tear down whatever the interrupted test had set up
+                    with contextlib.suppress(Exception):
+                        session._setupstate.teardown_exact(None)
+                self.outcomes[mutant_id] = (killed, timed_out)
+        finally:
+            self.schemata_module._ray_mutant_id = -1
+            signal.signal(signal.SIGALRM, saved_handler)
+            if saved_timer[0] > 0:
+                signal.setitimer(signal.ITIMER_REAL, *saved_timer)
+        return True
+
+def schemata_run_wrapper(benchmark_name, model_name, num_test_cases, task, write_results=True):
+    """
+    Builds the meta-mutant of a task and runs its tests once per mutant in this interpreter.
+
+    With `write_results`, the outcomes are written to the task's 'cosmic-ray.sqlite' the way
+    `cosmic-ray exec` would, and the unsupported mutants are left pending for it.
+
+    Returns:
+        A dictionary with the per-job outcomes and timings, or None if the task cannot run.
+    """
+    working_dir = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}'
+    schemata_dir = f'{working_dir}/schemata'
+
+    try:
+        with open(f'{working_dir}/cosmic-ray.toml', 'rb') as f:
+            timeout = tomllib.load(f)['cosmic-ray']['timeout']
+
+        start_time = time.time()
+        schemata_code, mutants = build_schemata(working_dir)
+        os.makedirs(schemata_dir, exist_ok=True)
+        with open(f'{schemata_dir}/mod.py', 'w') as f:
+            f.write(schemata_code)
+        shutil.copy(f'{working_dir}/test.py', f'{schemata_dir}/test.py')
+        build_time = time.time() - start_time
+    except Exception as e:
+        print(f'[-] Build Schemata Error @ [{working_dir}]: {e}')
+        return None
+
+    # Import the meta-mutant once; the tests re-use it from sys.modules
+    saved_path = list(sys.path)
+    purge_task_modules(schemata_dir)
+    sys.modules.pop('mod', None)
+    try:
+        sys.path.insert(0, os.path.abspath(schemata_dir))
+        schemata_module = importlib.import_module('mod')
+    except Exception as e:
+        print(f'[-] Import Schemata Error @ [{working_dir}]: {e}')
+        return None
+    finally:
+        sys.path[:] = saved_path
+
+    # The unmutated module (-1) runs first: it must pass, otherwise no outcome can be trusted
+    schema_mutants = [mutant for mutant in mutants if mutant["status"] == "schema"]
+    runner = SchemataRunner(schemata_module, [-1] + [mutant["mutant_id"] for mutant in schema_mutants], timeout)
+    start_time = time.time()
+    try:
+        # The session timeout covers collection and teardown (the same budget as the baseline setup): the runner
+        # pauses it and times each mutant itself
+        run_pytest_in_process(schemata_dir, 'test.py', timeout=60 * num_test_cases, keep_modules=True, cwd=working_dir, plugins=[runner])
+    finally:
+        purge_task_modules(schemata_dir)
+        sys.modules.pop('mod', None)
+    run_time = time.time() - start_time
+
+    if runner.outcomes.get(-1, (True, False))[0]:
+        print(f'[-] Schemata Baseline Failed @ [{working_dir}]')
+        return None
+
+    outcomes = dict()
+    for mutant in mutants:
+        if mutant["status"] == "no_test":
+            outcomes[mutant["job_id"]] = {"worker_outcome": "NO_TEST", "test_outcome": None, "output": None, "diff": None}
+        elif mutant["status"] == "equivalent":
+            outcomes[mutant["job_id"]] = {"worker_outcome": "NORMAL", "test_outcome": "SURVIVED", "output": "", "diff": mutant["diff"]}
+        elif mutant["status"] == "schema" and mutant["mutant_id"] in runner.outcomes:
+            # Same rule as cosmic-ray: a failing test or a timeout kills the mutant
+            killed, timed_out = runner.outcomes[mutant["mutant_id"]]
+            outcomes[mutant["job_id"]] = {"worker_outcome": "NORMAL", "test_outcome": "KILLED" if killed else "SURVIVED", "output": "timeout" if timed_out else "", "diff": mutant["diff"]}
+
+    if write_results:
+        with sqlite3.connect(f'{working_dir}/cosmic-ray.sqlite') as conn:
+            completed_jobs = {row[0] for row in conn.execute("SELECT job_id FROM work_results")}
+            conn.executemany("INSERT INTO work_results (worker_outcome, output, test_outcome, diff, job_id) VALUES (?, ?, ?, ?, ?)", [
+                (outcome["worker_outcome"], outcome["output"], outcome["test_outcome"], outcome["diff"], job_id)
+                for job_id, outcome in outcomes.items() if job_id not in completed_jobs
+            ])
+        conn.close()
+
+    return {
+        "task": task,
+        "total_mutants": len(mutants),
+        "schema_mutants": sum(1 for mutant in mutants if mutant["status"] == "schema"),
+        "unsupported_mutants": sum(1 for mutant in mutants if mutant["status"] == "unsupported"),
+        "build_time": build_time,
+        "run_time": run_time,
+        "outcomes": outcomes,
+    }
+
+def schemata_run(benchmark_name, model_generation_file, num_test_cases, baseline_test_cases=5):
+    """
+    Runs the mutants of every correct task through its meta-mutant.
+    The unsupported mutants stay pending: run `mutation_run` afterwards to execute them with cosmic-ray.
+    """
+    model_name = model_generation_file.split('/')[-1].split('.')[0]
+    correct_tasks = list()
+    correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{baseline_test_cases}_{model_name}'
+
+    with open(correct_tasks_path, 'r') as f:
+        for line in f.readlines():
+            correct_tasks.append(line.strip())
+    print(f'[+] ✅ Correct Tasks: {len(correct_tasks)}')
+
+    # A task crashing or hanging its worker gets no outcomes: its mutants stay pending for cosmic-ray.
+    # The time limit is the one `mutation_run` gives `cosmic-ray exec`
+    results = process_map_isolated(schemata_run_wrapper, [(benchmark_name, model_name, num_test_cases, task) for task in correct_tasks], lambda *args: None, desc="[+] 🧬 Running mutant schemata...", task_timeout=360*num_test_cases)
+    results = [result for result in results if result is not None]
+
+    executed_mutants = sum(len(result["outcomes"]) for result in results)
+    run_time = sum(result["build_time"] + result["run_time"] for result in results)
+    print(f'[+] ✅ Schemata Mutants: {executed_mutants} / {sum(result["total_mutants"] for result in results)} ({executed_mutants / run_time if run_time > 0 else 0:.2f} mutants/s per worker)')
+    print(f'[+] ⏳ Pending for cosmic-ray: {sum(result["unsupported_mutants"] for result in results)}')
+
+def schemata_verify(benchmark_name, model_generation_file, num_test_cases, sample_size=20, baseline_test_cases=5, seed=42):
+    """
+    Checks the schemata outcomes against completed `cosmic-ray exec` runs on a sample of tasks.
+
+    Returns:
+        A dictionary with the outcome agreement, the share of switchable mutants and the schemata throughput.
+    """
+    model_name = model_generation_file.split('/')[-1].split('.')[0]
+    correct_tasks = list()
+    correct_tasks_path = f'data/{benchmark_name}/correct_tasks_tc_{baseline_test_cases}_{model_name}'
+
+    with open(correct_tasks_path, 'r') as f:
+        for line in f.readlines():
+            correct_tasks.append(line.strip())
+    sampled_tasks = random.Random(seed).sample(correct_tasks, min(sample_size, len(correct_tasks)))
+    print(f'[+] ✅ Sampled Tasks: {len(sampled_tasks)} / {len(correct_tasks)}')
+
+    results = process_map_isolated(schemata_run_wrapper, [(benchmark_name, model_name, num_test_cases, task, False) for task in sampled_tasks], lambda *args: None, desc="[+] 🔍 Verifying mutant schemata...", task_timeout=360*num_test_cases)
+
+    report = {"tasks": 0, "compared_mutants": 0, "agreed_mutants": 0, "total_mutants": 0, "schema_mutants": 0, "run_time": 0.0, "disagreements": list()}
+    for task, result in zip(sampled_tasks, results):
+        if result is None: continue
+        with sqlite3.connect(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}/cosmic-ray.sqlite') as conn:
+            work_results = {job_id: (worker_outcome, test_outcome) for job_id, worker_outcome, test_outcome in conn.execute("SELECT job_id, worker_outcome, test_outcome FROM work_results")}
+        conn.close()
+
+        report["tasks"] += 1
+        report["total_mutants"] += result["total_mutants"]
+        report["schema_mutants"] += result["schema_mutants"]
+        report["run_time"] += result["build_time"] + result["run_time"]
+        for job_id, outcome in result["outcomes"].items():
+            if job_id not in work_results: continue
+            report["compared_mutants"] += 1
+            if work_results[job_id] == (outcome["worker_outcome"], outcome["test_outcome"]):
+                report["agreed_mutants"] += 1
+            else:
+                report["disagreements"].append({"task": task, "job_id": job_id, "cosmic_ray": work_results[job_id], "schemata": (outcome["worker_outcome"], outcome["test_outcome"])})
+
+    report["agreement_rate"] = report["agreed_mutants"] / report["compared_mutants"] if report["compared_mutants"] > 0 else 0.0
+    report["schema_rate"] = report["schema_mutants"] / report["total_mutants"] if report["total_mutants"] > 0 else 0.0
+    report["mutants_per_second"] = sum(len(result["outcomes"]) for result in results if result is not None) / report["run_time"] if report["run_time"] > 0 else 0.0
+    print(f'[+] ✅ Agreement: {report["agreement_rate"]:.2%} ({report["agreed_mutants"]}/{report["compared_mutants"]}) | Switchable Mutants: {report["schema_rate"]:.2%} | Throughput: {report["mutants_per_second"]:.2f} mutants/s per worker')
+
+    with open(f'data/{benchmark_name}/schemata_verification_tc_{num_test_cases}_{model_name}.json', 'w') as f:
+        f.write(json.dumps(report, indent=4))
+
+    return report
+
+
+if __name__ == "__main__":
+    model_generation_file_path = 'data/testbench_generation/TestBench_datasetv6.jsonl'
+    for num_test_cases in [5, 2, 1]:
+        schemata_verify('testbench', model_generation_file_path, num_test_cases, sample_size=20)
+        # schemata_run('testbench', model_generation_file_path, num_test_cases)
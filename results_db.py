@@ -0,0 +1,236 @@
+# coding: utf-8
+
+# Date: 2026-10-19
+# Description: Consolidated results database for the mutation sweeps.
+#
+# All mutation specs and work results of a sweep live in a few sharded, WAL-mode SQLite files
+# keyed by (benchmark, model, num_test_cases, task), instead of one 'cosmic-ray.sqlite' per task.
+# `cosmic-ray exec` still writes its per-task database; `import_task_db` mirrors it after each run.
+
+import os
+import time
+import zlib
+import sqlite3
+from collections import defaultdict
+from tqdm.contrib.concurrent import process_map
+
+NUM_SHARDS = 8
+
+schema = """
+CREATE TABLE IF NOT EXISTS tasks (
+    benchmark TEXT NOT NULL,
+    model TEXT NOT NULL,
+    num_test_cases INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    imported_at REAL NOT NULL,
+    PRIMARY KEY (benchmark, model, num_test_cases, task)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS mutation_specs (
+    benchmark TEXT NOT NULL,
+    model TEXT NOT NULL,
+    num_test_cases INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    module_path TEXT,
+    operator_name TEXT,
+    occurrence INTEGER,
+    start_pos_row INTEGER,
+    start_pos_col INTEGER,
+    end_pos_row INTEGER,
+    end_pos_col INTEGER,
+    ordinal INTEGER,
+    PRIMARY KEY (benchmark, model, num_test_cases, task, job_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS work_results (
+    benchmark TEXT NOT NULL,
+    model TEXT NOT NULL,
+    num_test_cases INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    worker_outcome TEXT,
+    output TEXT,
+    test_outcome TEXT,
+    diff TEXT,
+    PRIMARY KEY (benchmark, model, num_test_cases, task, job_id)
+) WITHOUT ROWID;
+
+-- Outcomes are stored as cosmic-ray writes them (enum names, e.g. 'SURVIVED'); compare them case-insensitively
+CREATE INDEX IF NOT EXISTS work_results_test_outcome ON work_results (benchmark, model, num_test_cases, test_outcome COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS work_results_worker_outcome ON work_results (benchmark, model, num_test_cases, worker_outcome COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS mutation_specs_operator_name ON mutation_specs (benchmark, model, num_test_cases, operator_name);
+"""
+
+def shard_path(db_dir, benchmark_name, model_name, num_test_cases, task, num_shards=NUM_SHARDS):
+    shard = zlib.crc32(f'{benchmark_name}/{model_name}/{num_test_cases}/{task}'.encode()) % num_shards
+    return os.path.join(db_dir, f'results_{shard:02d}.sqlite')
+
+def shard_paths(db_dir, num_shards=NUM_SHARDS):
+    return [os.path.join(db_dir, f'results_{shard:02d}.sqlite') for shard in range(num_shards)]
+
+def connect(db_path):
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    # Autocommit mode: transactions are opened explicitly with 'BEGIN IMMEDIATE'
+    conn = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=60000")
+    conn.executescript(schema)
+    # Shards created before `ordinal` was added
+    if 'ordinal' not in [row[1] for row in conn.execute("PRAGMA table_info(mutation_specs)")]:
+        conn.execute("ALTER TABLE mutation_specs ADD COLUMN ordinal INTEGER")
+    return conn
+
+def write_with_retry(conn, write_fn, retries=10):
+    """
+    Runs `write_fn(conn)` inside one 'BEGIN IMMEDIATE' transaction, retrying while another writer holds the lock.
+    """
+    for attempt in range(retries):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or attempt == retries - 1: raise
+            time.sleep(0.1 * (attempt + 1))
+            continue
+        try:
+            write_fn(conn)
+            conn.execute("COMMIT")
+            return
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+def import_task_db(db_dir, benchmark_name, model_name, num_test_cases, task, num_shards=NUM_SHARDS):
+    """
+    Mirrors a task's 'cosmic-ray.sqlite' into its shard, replacing any previous rows of the task.
+
+    Returns:
+        A tuple (number of mutation specs, number of work results), or None if the task has no database.
+    """
+    task_db_path = f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}/{task}/cosmic-ray.sqlite'
+    if not os.path.exists(task_db_path):
+        return None
+
+    key = (benchmark_name, model_name, num_test_cases, task)
+    with sqlite3.connect(task_db_path) as task_conn:
+        # `ordinal` keeps the order of the task database (rowid), which the per-task readers return
+        mutation_specs = task_conn.execute("SELECT job_id, module_path, operator_name, occurrence, start_pos_row, start_pos_col, end_pos_row, end_pos_col, rowid FROM mutation_specs ORDER BY rowid").fetchall()
+        work_results = task_conn.execute("SELECT job_id, worker_outcome, output, test_outcome, diff FROM work_results").fetchall()
+    task_conn.close()
+
+    def write(conn):
+        conn.execute("DELETE FROM work_results WHERE benchmark = ? AND model = ? AND num_test_cases = ? AND task = ?", key)
+        conn.execute("DELETE FROM mutation_specs WHERE benchmark = ? AND model = ? AND num_test_cases = ? AND task = ?", key)
+        conn.executemany("INSERT INTO mutation_specs (benchmark, model, num_test_cases, task, job_id, module_path, operator_name, occurrence, start_pos_row, start_pos_col, end_pos_row, end_pos_col, ordinal) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [key + tuple(row) for row in mutation_specs])
+        conn.executemany("INSERT INTO work_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [key + tuple(row) for row in work_results])
+        conn.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?)", key + (time.time(),))
+
+    conn = connect(shard_path(db_dir, *key, num_shards=num_shards))
+    try:
+        write_with_retry(conn, write)
+    finally:
+        conn.close()
+    return (len(mutation_specs), len(work_results))
+
+def import_task_wrapper(db_dir, benchmark_name, model_name, num_test_cases, task, num_shards=NUM_SHARDS):
+    try:
+        return import_task_db(db_dir, benchmark_name, model_name, num_test_cases, task, num_shards)
+    except Exception as e:
+        # e.g. an empty or partially written 'cosmic-ray.sqlite'
+        print(f'[-] Import Error @ [{task}]: {e}')
+        return None
+
+def import_existing(db_dir, benchmark_name, model_generation_file, num_test_cases, num_shards=NUM_SHARDS):
+    """
+    Imports every existing per-task 'cosmic-ray.sqlite' of a model into the consolidated database.
+    """
+    model_name = model_generation_file.split('/')[-1].split('.')[0]
+    tasks = [task for task in os.listdir(f'data/{benchmark_name}/mutation_{num_test_cases}/{model_name}') if task.startswith('task_')]
+
+    imported = process_map(import_task_wrapper, [db_dir]*len(tasks), [benchmark_name]*len(tasks), [model_name]*len(tasks), [num_test_cases]*len(tasks), tasks, [num_shards]*len(tasks), desc=f"[+] 📥 Importing {model_name} ({num_test_cases} test cases) databases", chunksize=8)
+    imported = [counts for counts in imported if counts is not None]
+    print(f'[+] ✅ Imported Tasks: {len(imported)} (Mutation Specs: {sum(c[0] for c in imported)}, Work Results: {sum(c[1] for c in imported)})')
+
+def task_status(db_dir, benchmark_name, model_name, num_test_cases, task, num_shards=NUM_SHARDS):
+    """
+    Same contract as `main.cosmic_ray_status`: (completed, total jobs, completed jobs).
+    Tasks that were never imported are reported as incomplete.
+    """
+    key = (benchmark_name, model_name, num_test_cases, task)
+    db_path = shard_path(db_dir, *key, num_shards=num_shards)
+    if not os.path.exists(db_path):
+        return (False, 0, 0)
+
+    conn = connect(db_path)
+    try:
+        if conn.execute("SELECT 1 FROM tasks WHERE benchmark = ? AND model = ? AND num_test_cases = ? AND task = ?", key).fetchone() is None:
+            return (False, 0, 0)
+        total_jobs_number = conn.execute("SELECT COUNT(*) FROM mutation_specs WHERE benchmark = ? AND model = ? AND num_test_cases = ? AND task = ?", key).fetchone()[0]
+        completed_jobs_number = conn.execute("SELECT COUNT(*) FROM work_results WHERE benchmark = ? AND model = ? AND num_test_cases = ? AND task = ?", key).fetchone()[0]
+    finally:
+        conn.close()
+
+    if total_jobs_number == 0: return (True, 0, 0)
+    return (completed_jobs_number == total_jobs_number, total_jobs_number, completed_jobs_number)
+
+def model_statistics(db_dir, benchmark_name, model_name, num_test_cases, num_shards=NUM_SHARDS):
+    """
+    Computes the `main.mutation_statistic_wrapper` dictionary of every imported task of a model,
+    with one grouped query per shard.
+
+    Returns:
+        A dictionary mapping the task name to its statistic info.
+    """
+    counts = defaultdict(lambda: {"total_jobs_number": 0, "completed_jobs_number": 0, "surviving_mutants_number": 0})
+    key = (benchmark_name, model_name, num_test_cases)
+
+    for db_path in shard_paths(db_dir, num_shards):
+        if not os.path.exists(db_path): continue
+        conn = connect(db_path)
+        try:
+            for task, total_jobs_number in conn.execute("SELECT task, COUNT(*) FROM mutation_specs WHERE benchmark = ? AND model = ? AND num_test_cases = ? GROUP BY task", key):
+                counts[task]["total_jobs_number"] = total_jobs_number
+            for task, completed_jobs_number, surviving_mutants_number in conn.execute("SELECT task, COUNT(*), SUM(test_outcome = 'SURVIVED' COLLATE NOCASE) FROM work_results WHERE benchmark = ? AND model = ? AND num_test_cases = ? GROUP BY task", key):
+                counts[task]["completed_jobs_number"] = completed_jobs_number
+                counts[task]["surviving_mutants_number"] = surviving_mutants_number or 0
+        finally:
+            conn.close()
+
+    statistics = dict()
+    for task, task_counts in counts.items():
+        statistic_info = {"task": task, **task_counts}
+        statistic_info['complete_rate'] = statistic_info['completed_jobs_number'] / statistic_info["total_jobs_number"] if statistic_info["total_jobs_number"] > 0 else 0
+        statistic_info['surviving_mutants_rate'] = (statistic_info['surviving_mutants_number'] / statistic_info['completed_jobs_number']) if statistic_info['completed_jobs_number'] > 0 else 0
+        statistics[task] = statistic_info
+    return statistics
+
+def model_mutations(db_dir, benchmark_name, model_name, num_test_cases, num_shards=NUM_SHARDS):
+    """
+    Loads the mutation specs and work results of every imported task of a model.
+
+    Returns:
+        A dictionary mapping the task name to a tuple (mutations, work_results), shaped like the
+        `mutation_specs` / `work_results` queries of `generate_mutation_details.main`.
+    """
+    mutations = defaultdict(list)
+    work_results = defaultdict(dict)
+    key = (benchmark_name, model_name, num_test_cases)
+
+    for db_path in shard_paths(db_dir, num_shards):
+        if not os.path.exists(db_path): continue
+        conn = connect(db_path)
+        try:
+            for task, *mutation in conn.execute("SELECT task, job_id, operator_name, start_pos_row, start_pos_col, end_pos_row, end_pos_col FROM mutation_specs WHERE benchmark = ? AND model = ? AND num_test_cases = ? ORDER BY task, ordinal", key):
+                mutations[task].append(tuple(mutation))
+            for task, job_id, test_outcome, diff in conn.execute("SELECT task, job_id, test_outcome, diff FROM work_results WHERE benchmark = ? AND model = ? AND num_test_cases = ?", key):
+                work_results[task][job_id] = {"test_outcome": test_outcome, "diff": diff}
+        finally:
+            conn.close()
+
+    return {task: (mutations[task], work_results[task]) for task in mutations}
+
+
+if __name__ == "__main__":
+    for num_test_cases in [5, 2, 1]:
+        import_existing('data/testbench/results_db', 'testbench', 'data/testbench_generation/TestBench_datasetv6.jsonl', num_test_cases)